@@ -4,10 +4,18 @@ GUI application for document search engine using tkinter.
 import tkinter as tk  # Main GUI framework for creating the application window
 from tkinter import ttk, scrolledtext  # Themed widgets and scrollable text area
 import time  # Measure indexing elapsed time
+import threading  # Run query reformulation off the Tk main thread
 import zipfile  # Read HTML files from ZIP archive for snippet extraction
-from indexer import build_reverse_index  # Build the reverse index from ZIP file
+from collections import OrderedDict  # LRU cache of tokenized documents for snippets
+from bisect import bisect_left  # Map a word position to its char offset in O(log n)
+from itertools import accumulate  # Prefix-sum the word lengths into char offsets
+from indexer import load_or_build_reverse_index  # Load the cached index or build it from the ZIP file
 from searcher import enhanced_search  # Perform search queries on the index
-from tokenizer import tokenize_html, HTMLTextExtractor  # Extract text content from HTML documents
+from keyword_extractor import extract_keywords, calculate_correlations  # Expand queries with correlated keywords
+from result_manager import ResultManager  # Remember top-ranked documents between passes
+from tokenizer import tokenize_html_stream, HTMLTextExtractor  # Extract text content from HTML documents
+# How many tokenized documents the snippet cache keeps around
+_SNIPPET_CACHE_SIZE = 512
 class SearchGUI:
     # Initialize the search GUI with root window and ZIP file
     def __init__(self, root, zip_file="rhf.zip"):
@@ -19,9 +27,15 @@ class SearchGUI:
         self.document_map = None
         self.zip_handle = None
         self.snippet_parser = None
+        self.result_manager = ResultManager()
+        self.snippet_cache = OrderedDict()
+        self.search_generation = 0
         self.load_data()
         self.setup_gui()
         self.zip_handle = zipfile.ZipFile(self.zip_file, 'r')
+        # Cache the central directory once; opening by ZipInfo skips the
+        # name-based getinfo lookup inside zipfile on every snippet read
+        self.zip_infos = {zi.filename: zi for zi in self.zip_handle.infolist()}
         self.snippet_parser = HTMLTextExtractor()
     # Close ZIP file when GUI is destroyed
     def __del__(self):
@@ -32,7 +46,7 @@ class SearchGUI:
         print(f"Loading index from {self.zip_file}...")
         print()
         start_time = time.time()
-        self.reverse_index, self.document_map = build_reverse_index(self.zip_file)
+        self.reverse_index, self.document_map = load_or_build_reverse_index(self.zip_file)
         elapsed_time = time.time() - start_time
         print()
         print(f"✓ Total indexing time: {elapsed_time:.2f} seconds ({elapsed_time/60:.2f} minutes)")
@@ -70,6 +84,9 @@ class SearchGUI:
             return
         self.status_var.set("Searching...")
         self.root.update()
+        # Any rewrite of the results pane invalidates pending reformulation
+        # renders, including the error and no-results exits below
+        self.search_generation += 1
         self.results_text.delete(1.0, tk.END)
         results, message = enhanced_search(self.reverse_index, search_term, self.document_map)
         if results is None:
@@ -80,70 +97,143 @@ class SearchGUI:
             self.results_text.insert(tk.END, f"{message}\n")
             self.status_var.set(message)
             return
-        self.results_text.insert(tk.END, f"{message}:\n\n")
+        # Build the whole report in memory first; each Text.insert triggers
+        # widget relayout, so one big insert beats hundreds of small ones
+        buf = [f"{message}:\n\n"]
         # Display each search result with its ranking and details
         for i, doc in enumerate(results, 1):
             filename = doc['doc_id'].split('/')[-1]
-            self.results_text.insert(tk.END, f"{i}. {filename}\n")
+            buf.append(f"{i}. {filename}\n")
             if 'similarity' in doc:
-                self.results_text.insert(tk.END, f"   - Similarity score: {doc['similarity']:.4f}\n")
-                self.results_text.insert(tk.END, f"   - Matched terms: {', '.join(doc['matched_terms'])}\n")
+                buf.append(f"   - Similarity score: {doc['similarity']:.4f}\n")
+                buf.append(f"   - Matched terms: {', '.join(doc['matched_terms'])}\n")
                 if doc['matched_terms']:
                     first_term = doc['matched_terms'][0]
                     if first_term in self.reverse_index:
-                        for doc_data in self.reverse_index[first_term]['docs']:
-                            if doc_data['doc_id'] == doc['doc_id'] and doc_data['positions']:
-                                snippet = self.get_text_snippet(doc['doc_id'], doc_data['positions'][0])
-                                self.results_text.insert(tk.END, f"   - Snippet: \"{snippet}\"\n")
-                                break
+                        doc_data = self.reverse_index[first_term]['docs_by_id'].get(doc['doc_id'])
+                        if doc_data is not None and doc_data.positions:
+                            snippet = self.get_text_snippet(doc['doc_id'], doc_data.positions[0])
+                            buf.append(f"   - Snippet: \"{snippet}\"\n")
             else:
-                self.results_text.insert(tk.END, f"   - Appears {doc['term_freq']} times\n")
-                self.results_text.insert(tk.END, f"   - TF-IDF score: {doc['tf_idf']:.4f}\n")
-                self.results_text.insert(tk.END, f"   - Matched term: {doc['matched_term']}\n")
+                buf.append(f"   - Appears {doc['term_freq']} times\n")
+                buf.append(f"   - TF-IDF score: {doc['tf_idf']:.4f}\n")
+                buf.append(f"   - Matched term: {doc['matched_term']}\n")
                 if doc['positions']:
                     positions_str = ', '.join(map(str, doc['positions'][:5]))
                     if len(doc['positions']) > 5:
                         positions_str += f", ... (+{len(doc['positions']) - 5} more)"
-                    self.results_text.insert(tk.END, f"   - Positions: [{positions_str}]\n")
+                    buf.append(f"   - Positions: [{positions_str}]\n")
                     snippet = self.get_text_snippet(doc['doc_id'], doc['positions'][0])
-                    self.results_text.insert(tk.END, f"   - Snippet: \"{snippet}\"\n")
-            self.results_text.insert(tk.END, "\n")
+                    buf.append(f"   - Snippet: \"{snippet}\"\n")
+            buf.append("\n")
+        self.results_text.insert(tk.END, ''.join(buf))
         self.status_var.set(message)
+        self.result_manager.save_top_results(results, top_n=10)
+        # Reformulation runs correlation scoring plus a second search; do it
+        # on a worker thread so the button stays responsive, tagged with the
+        # generation so a stale pass never renders over a newer pane
+        threading.Thread(
+            target=self.reformulate_and_search,
+            args=(search_term, self.search_generation),
+            daemon=True,
+        ).start()
+    # Expand the query with the best-correlated keywords from the top results and search again
+    def reformulate_and_search(self, search_term, generation):
+        query = search_term.strip().lower()
+        # Reformulation only applies to plain term queries, not operators or phrases
+        if query.startswith(('"', "'")) or ' or ' in query or ' and ' in query or ' but ' in query:
+            return
+        top_doc_ids = self.result_manager.top_results
+        if not top_doc_ids:
+            return
+        # split() already strips whitespace; dedupe while keeping order and
+        # drop terms the index has never seen so the correlation loop only
+        # sees terms with postings
+        query_terms = list(dict.fromkeys(
+            term for term in search_term.lower().split() if term in self.reverse_index
+        ))
+        if not query_terms:
+            return
+        keywords = extract_keywords(top_doc_ids, self.document_map)
+        correlations = calculate_correlations(query_terms, keywords, self.reverse_index)
+        query_set = set(query_terms)
+        ranked_keywords = sorted(
+            (k for k in correlations if k not in query_set),
+            key=lambda k: correlations[k],
+            reverse=True,
+        )
+        expansion_terms = ranked_keywords[:3]
+        if not expansion_terms:
+            return
+        reformulated_query = ' '.join(query_terms + expansion_terms)
+        # Only the top ten are displayed, so let the ranker prune past them
+        results, message = enhanced_search(
+            self.reverse_index, reformulated_query, self.document_map, top_n=10
+        )
+        buf = ["=" * 60 + "\n", f"REFORMULATED QUERY: {reformulated_query}\n", f"{message}\n\n"]
+        if results:
+            # Show the top reformulated matches below the original results
+            for i, doc in enumerate(results[:10], 1):
+                filename = doc['doc_id'].split('/')[-1]
+                buf.append(f"{i}. {filename}\n")
+                if 'similarity' in doc:
+                    buf.append(f"   - Similarity score: {doc['similarity']:.4f}\n")
+            buf.append("\n")
+        # Tk widgets are not thread-safe; hand the finished text back to the
+        # main loop instead of touching results_text from this thread
+        self.root.after(0, self.render_reformulated, ''.join(buf), generation)
+    # Append the reformulated results on the main thread if still current
+    def render_reformulated(self, text, generation):
+        if generation != self.search_generation:
+            return
+        self.results_text.insert(tk.END, text)
     # Clear the results text area
     def clear_results(self):
+        self.search_generation += 1
         self.results_text.delete(1.0, tk.END)
         self.status_var.set("Results cleared")
+    # Return (full_text, word positions, char offsets) for a document,
+    # re-deriving it at most once per cache window; every snippet used to
+    # re-read, re-parse, and re-join the whole page
+    def get_tokenized_document(self, doc_id):
+        cached = self.snippet_cache.get(doc_id)
+        if cached is not None:
+            self.snippet_cache.move_to_end(doc_id)
+            return cached
+        # Stream the entry straight into the tokenizer; the page is parsed
+        # as it decompresses instead of being decoded into one big string
+        with self.zip_handle.open(self.zip_infos[doc_id]) as file:
+            words_with_positions, _ = tokenize_html_stream(file, self.snippet_parser)
+        text_positions = {}
+        for word, pos in words_with_positions:
+            if pos not in text_positions:
+                text_positions[pos] = word
+        sorted_positions = sorted(text_positions.keys())
+        words = [text_positions[pos] for pos in sorted_positions]
+        full_text = ' '.join(words)
+        # offsets[i] is the char offset of word i in full_text, computed once
+        # as a prefix sum over the word lengths (plus the joining space)
+        offsets = list(accumulate((len(word) + 1 for word in words), initial=0))[:-1]
+        cached = (full_text, sorted_positions, offsets)
+        self.snippet_cache[doc_id] = cached
+        if len(self.snippet_cache) > _SNIPPET_CACHE_SIZE:
+            self.snippet_cache.popitem(last=False)
+        return cached
     # Extract text snippet around a word position from one period to the next
     def get_text_snippet(self, doc_id, position):
         try:
-            with self.zip_handle.open(doc_id) as file:
-                html_content = file.read().decode('utf-8', errors='ignore')
-            words_with_positions, _ = tokenize_html(html_content, self.snippet_parser)
-            if not words_with_positions:
+            full_text, sorted_positions, offsets = self.get_tokenized_document(doc_id)
+            if not sorted_positions:
                 return "No text available"
-            text_positions = {}
-            for word, pos in words_with_positions:
-                if pos not in text_positions:
-                    text_positions[pos] = word
-            sorted_positions = sorted(text_positions.keys())
-            full_text = ' '.join(text_positions[pos] for pos in sorted_positions)
-            char_position = 0
-            for pos in sorted_positions:
-                if pos >= position:
-                    break
-                char_position += len(text_positions[pos]) + 1
-            start = 0
-            # Find previous period
-            for i in range(char_position - 1, -1, -1):
-                if full_text[i] == '.':
-                    start = i + 1
-                    break
-            end = len(full_text)
-            # Find next period
-            for i in range(char_position, len(full_text)):
-                if full_text[i] == '.':
-                    end = i + 1
-                    break
+            # First word at or past the requested position; its offset equals
+            # the old linear accumulation over all earlier words
+            word_index = bisect_left(sorted_positions, position)
+            char_position = offsets[word_index] if word_index < len(offsets) else len(full_text)
+            # rfind/find run the same period scans in C; rfind returns -1
+            # when there is no previous period, which lands start on 0
+            start = full_text.rfind('.', 0, char_position) + 1
+            next_period = full_text.find('.', char_position)
+            end = len(full_text) if next_period < 0 else next_period + 1
             snippet = full_text[start:end].strip()
             if len(snippet) > 200:
                 snippet = snippet[:200] + "..."
@@ -152,64 +242,58 @@ class SearchGUI:
             return f"Error extracting snippet: {str(e)}"
     # Display comprehensive statistics about the index
     def show_stats(self):
+        self.search_generation += 1
         self.results_text.delete(1.0, tk.END)
         self.status_var.set("Displaying index statistics...")
         self.root.update()
-        self.results_text.insert(tk.END, "INDEX STATISTICS\n")
-        self.results_text.insert(tk.END, "=" * 90 + "\n\n")
+        # Accumulate the whole report and insert it once; per-line inserts
+        # re-layout the text widget every time
+        buf = ["INDEX STATISTICS\n", "=" * 90 + "\n\n"]
         total_tokens = len(self.reverse_index)
         total_docs = len(self.document_map)
-        self.results_text.insert(tk.END, f"Total Unique Tokens: {total_tokens:,}\n")
-        self.results_text.insert(tk.END, f"Total Documents: {total_docs:,}\n\n")
+        buf.append(f"Total Unique Tokens: {total_tokens:,}\n")
+        buf.append(f"Total Documents: {total_docs:,}\n\n")
         token_stats = []
-        # Calculate comprehensive statistics for each token
+        # The per-token aggregates are precomputed at index-build time, so
+        # this no longer walks any posting lists
         for token, data in self.reverse_index.items():
-            df = data['df']
-            total_freq = sum(doc['term_freq'] for doc in data['docs'])
-            avg_tfidf = sum(doc['tf_idf'] for doc in data['docs']) / len(data['docs'])
-            max_tfidf = max(doc['tf_idf'] for doc in data['docs'])
             token_stats.append({
                 'token': token,
-                'doc_freq': df,
-                'total_freq': total_freq,
-                'avg_tfidf': avg_tfidf,
-                'max_tfidf': max_tfidf
+                'doc_freq': data['df'],
+                'total_freq': data['total_freq'],
+                'avg_tfidf': data['sum_tfidf'] / data['df'],
+                'max_tfidf': data['max_tfidf']
             })
         token_stats.sort(key=lambda x: x['doc_freq'], reverse=True)
-        self.results_text.insert(tk.END, "TOP 30 TOKENS BY DOCUMENT FREQUENCY\n")
-        self.results_text.insert(tk.END, "=" * 90 + "\n")
-        header = f"{'Rank':<6}{'Token':<20}{'Doc Freq':<12}{'Total Freq':<14}{'Avg TF-IDF':<14}{'Max TF-IDF':<14}\n"
-        self.results_text.insert(tk.END, header)
-        self.results_text.insert(tk.END, "-" * 90 + "\n")
+        buf.append("TOP 30 TOKENS BY DOCUMENT FREQUENCY\n")
+        buf.append("=" * 90 + "\n")
+        buf.append(f"{'Rank':<6}{'Token':<20}{'Doc Freq':<12}{'Total Freq':<14}{'Avg TF-IDF':<14}{'Max TF-IDF':<14}\n")
+        buf.append("-" * 90 + "\n")
         # Display top 30 tokens in tabular format
         for i, stats in enumerate(token_stats[:30], 1):
             token_display = stats['token'][:18] + '..' if len(stats['token']) > 18 else stats['token']
-            row = f"{i:<6}{token_display:<20}{stats['doc_freq']:<12}{stats['total_freq']:<14}{stats['avg_tfidf']:<14.4f}{stats['max_tfidf']:<14.4f}\n"
-            self.results_text.insert(tk.END, row)
-        self.results_text.insert(tk.END, "\n")
-        self.results_text.insert(tk.END, "DOCUMENT STATISTICS\n")
-        self.results_text.insert(tk.END, "=" * 90 + "\n")
-        doc_token_counts = {}
-        # Count unique tokens per document
-        for token, data in self.reverse_index.items():
-            for doc_info in data['docs']:
-                doc_id = doc_info['doc_id']
-                if doc_id not in doc_token_counts:
-                    doc_token_counts[doc_id] = 0
-                doc_token_counts[doc_id] += 1
+            buf.append(f"{i:<6}{token_display:<20}{stats['doc_freq']:<12}{stats['total_freq']:<14}{stats['avg_tfidf']:<14.4f}{stats['max_tfidf']:<14.4f}\n")
+        buf.append("\n")
+        buf.append("DOCUMENT STATISTICS\n")
+        buf.append("=" * 90 + "\n")
+        # Unique token counts per document come straight off the document map
+        doc_token_counts = {
+            doc_id: info['n_tokens'] for doc_id, info in self.document_map.items()
+        }
         if doc_token_counts:
             avg_tokens = sum(doc_token_counts.values()) / len(doc_token_counts)
             max_doc = max(doc_token_counts.items(), key=lambda x: x[1])
             min_doc = min(doc_token_counts.items(), key=lambda x: x[1])
-            self.results_text.insert(tk.END, f"Average Unique Tokens per Document: {avg_tokens:.2f}\n")
-            self.results_text.insert(tk.END, f"Document with Most Tokens: {max_doc[0].split('/')[-1]} ({max_doc[1]:,} tokens)\n")
-            self.results_text.insert(tk.END, f"Document with Fewest Tokens: {min_doc[0].split('/')[-1]} ({min_doc[1]:,} tokens)\n\n")
+            buf.append(f"Average Unique Tokens per Document: {avg_tokens:.2f}\n")
+            buf.append(f"Document with Most Tokens: {max_doc[0].split('/')[-1]} ({max_doc[1]:,} tokens)\n")
+            buf.append(f"Document with Fewest Tokens: {min_doc[0].split('/')[-1]} ({min_doc[1]:,} tokens)\n\n")
         vector_lengths = [doc['vector_length'] for doc in self.document_map.values()]
         if vector_lengths:
             avg_vector_length = sum(vector_lengths) / len(vector_lengths)
             max_vector_length = max(vector_lengths)
             min_vector_length = min(vector_lengths)
-            self.results_text.insert(tk.END, f"Average Document Vector Length: {avg_vector_length:.4f}\n")
-            self.results_text.insert(tk.END, f"Maximum Document Vector Length: {max_vector_length:.4f}\n")
-            self.results_text.insert(tk.END, f"Minimum Document Vector Length: {min_vector_length:.4f}\n")
+            buf.append(f"Average Document Vector Length: {avg_vector_length:.4f}\n")
+            buf.append(f"Maximum Document Vector Length: {max_vector_length:.4f}\n")
+            buf.append(f"Minimum Document Vector Length: {min_vector_length:.4f}\n")
+        self.results_text.insert(tk.END, ''.join(buf))
         self.status_var.set("Statistics displayed")
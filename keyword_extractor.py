@@ -0,0 +1,41 @@
+"""
+Keyword extraction and correlation scoring for query reformulation.
+"""
+# Collect the highest-scoring terms across the top documents
+def extract_keywords(top_doc_ids, document_map):
+    # The indexer precomputes each document's top terms by TF-IDF, so this
+    # is a union of small tuples instead of full per-document vocabularies
+    if not top_doc_ids:
+        return []
+    return list(set().union(*(document_map[doc_id]['top_terms'] for doc_id in top_doc_ids)))
+# Score each keyword by its co-occurrence strength with the query terms
+def calculate_correlations(query_terms, keywords, reverse_index):
+    # Drop keywords without postings once up front so the inner loop never
+    # sees a miss; they still score 0 in the returned mapping. Each kept
+    # keyword's posting columns are zipped into a doc->score map once, paid
+    # per keyword rather than per (query term, keyword) pair
+    correlations = {keyword: 0 for keyword in keywords}
+    indexed_keywords = [
+        (keyword, dict(zip(entry['doc_ids'], entry['tf_idfs'])))
+        for keyword, entry in (
+            (keyword, reverse_index.get(keyword)) for keyword in keywords
+        )
+        if entry is not None
+    ]
+    # Build each query term's posting columns once, then probe every
+    # keyword's map with them; posting lists are in crawl order, not sorted,
+    # so hash probes replace an order-dependent merge
+    for query_term in query_terms:
+        query_entry = reverse_index.get(query_term)
+        if query_entry is None:
+            continue
+        query_ids = query_entry['doc_ids']
+        query_tf_idfs = query_entry['tf_idfs']
+        for keyword, keyword_scores in indexed_keywords:
+            total = correlations[keyword]
+            for i, query_id in enumerate(query_ids):
+                keyword_tf_idf = keyword_scores.get(query_id)
+                if keyword_tf_idf is not None:
+                    total += query_tf_idfs[i] + keyword_tf_idf
+            correlations[keyword] = total
+    return correlations
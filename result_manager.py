@@ -0,0 +1,19 @@
+"""
+Tracks the top-ranked documents from the most recent search for reformulation.
+"""
+import heapq  # Select the top N results without sorting the whole list
+class ResultManager:
+    # Initialize with no saved results
+    def __init__(self):
+        self.top_results = []
+    # Save the doc ids of the highest-ranked results, best first
+    def save_top_results(self, results, top_n=None):
+        key = lambda r: r.get('similarity', r.get('tf_idf', 0))
+        if top_n is None:
+            ranked = sorted(results, key=key, reverse=True)
+        else:
+            # nlargest is O(n log top_n) and skips building a fully sorted
+            # copy of the result list just to slice a handful off the front
+            ranked = heapq.nlargest(top_n, results, key=key)
+        self.top_results = [r['doc_id'] for r in ranked]
+        return self.top_results
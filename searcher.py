@@ -2,53 +2,67 @@
 Search functions for document retrieval including phrase, boolean, and vector space search.
 """
 import math  # Calculate square root for vector normalization in cosine similarity
-# Get set of document IDs containing a term
+import heapq  # Track the running top-N partial scores for pruned ranking
+from bisect import bisect_right  # Jump to the next candidate position in sorted postings
+# Get set-like view of document IDs containing a term
 def get_doc_ids(reverse_index, term):
     if term in reverse_index:
-        return set(doc['doc_id'] for doc in reverse_index[term]['docs'])
-    return set()
+        # Keys views support the set operators directly, so no per-call set
+        # is materialized from the posting list
+        return reverse_index[term]['docs_by_id'].keys()
+    return frozenset()
 # Get document data for a specific term and doc_id
 def get_doc_data(reverse_index, term, doc_id):
     if term in reverse_index:
-        for doc in reverse_index[term]['docs']:
-            if doc['doc_id'] == doc_id:
-                return doc
+        return reverse_index[term]['docs_by_id'].get(doc_id)
     return None
-# Aggregate TF-IDF scores and positions for multiple terms in a document
-def aggregate_terms(reverse_index, terms, doc_id):
+# Aggregate TF-IDF scores and positions for a document across prefetched
+# term entries (term -> reverse_index entry, as built by the search branches)
+def aggregate_terms(entries, doc_id):
     combined_tf_idf = 0
     combined_freq = 0
     all_positions = []
     matched_terms = []
     # Collect and aggregate TF-IDF scores and positions for each term
-    for term in terms:
-        doc = get_doc_data(reverse_index, term, doc_id)
+    for term, entry in entries.items():
+        doc = entry['docs_by_id'].get(doc_id) if entry is not None else None
         if doc:
-            combined_tf_idf += doc['tf_idf']
-            combined_freq += doc['term_freq']
-            all_positions.extend(doc['positions'])
+            combined_tf_idf += doc.tf_idf
+            combined_freq += doc.term_freq
+            all_positions.extend(doc.positions)
             matched_terms.append(term)
     return combined_tf_idf, combined_freq, sorted(all_positions), matched_terms
+# Intersect posting dicts by walking the smallest one in its stored crawl
+# order and probing the rest, so the common doc ids come out already ordered
+# with no sort pass over the intersection
+def common_doc_ids(posting_dicts):
+    smallest = min(posting_dicts, key=len)
+    others = [postings for postings in posting_dicts if postings is not smallest]
+    return [
+        doc_id for doc_id in smallest
+        if all(doc_id in postings for postings in others)
+    ]
 # Check if words are close together for phrases
 def check_proximity(word_positions, proximity):
-    words = list(word_positions.keys())
-    if len(words) < 2:
+    # Pull the position lists out of the dict once; the loops below run per
+    # start position and should not pay key hashing on every iteration
+    position_lists = list(word_positions.values())
+    if len(position_lists) < 2:
         return True
+    first_positions = position_lists[0]
+    rest = position_lists[1:]
     # Check each position of the first word to find phrase matches
-    for pos1 in word_positions[words[0]]:
+    for pos1 in first_positions:
         found_sequence = True
         current_pos = pos1
         # Loop through remaining words to check if they appear in sequence
-        for i in range(1, len(words)):
-            word = words[i]
-            found_next = False
-            # Loop through positions of current word to find one within proximity
-            for pos in word_positions[word]:
-                if pos > current_pos and pos <= current_pos + proximity:
-                    current_pos = pos
-                    found_next = True
-                    break
-            if not found_next:
+        for positions in rest:
+            # Positions are sorted, so binary search for the first one past
+            # current_pos instead of scanning the list from the front
+            idx = bisect_right(positions, current_pos)
+            if idx < len(positions) and positions[idx] <= current_pos + proximity:
+                current_pos = positions[idx]
+            else:
                 found_sequence = False
                 break
         if found_sequence:
@@ -56,20 +70,22 @@ def check_proximity(word_positions, proximity):
     return False
 # Phrase search function with proximity tolerance
 def phrase_search(reverse_index, words, proximity):
-    missing_words = [word for word in words if word not in reverse_index]
+    # Probe the index once per word; the missing check, the intersection
+    # and the position lookups below all reuse these entries
+    entries = {word: reverse_index.get(word) for word in words}
+    missing_words = [word for word, entry in entries.items() if entry is None]
     if missing_words:
         return [], f"No documents found. Words not in index: {', '.join(missing_words)}"
-    doc_sets = [get_doc_ids(reverse_index, word) for word in words]
-    common_docs = doc_sets[0].intersection(*doc_sets[1:]) if len(doc_sets) > 1 else doc_sets[0]
+    common_docs = common_doc_ids([entries[word]['docs_by_id'] for word in words])
     if not common_docs:
         return [], f"No documents found containing all words: {', '.join(words)}"
     results = []
     phrase = ' '.join(words)
     # Check each document for phrase proximity matches
-    for doc_id in sorted(common_docs):
-        word_positions = {word: get_doc_data(reverse_index, word, doc_id)['positions'] for word in words}
+    for doc_id in common_docs:
+        word_positions = {word: entries[word]['docs_by_id'][doc_id].positions for word in words}
         if check_proximity(word_positions, proximity):
-            tf_idf, freq, positions, _ = aggregate_terms(reverse_index, words, doc_id)
+            tf_idf, freq, positions, _ = aggregate_terms(entries, doc_id)
             results.append({
                 'doc_id': doc_id,
                 'term_freq': freq,
@@ -80,47 +96,107 @@ def phrase_search(reverse_index, words, proximity):
     if not results:
         return [], f"No documents found with phrase '{phrase}' within {proximity} characters"
     return results, f"Found {len(results)} document(s) containing phrase '{phrase}' (within {proximity} characters)"
-# Vector space model search using cosine similarity
-def vector_space_search(reverse_index, document_map, query_terms):
+# Vector space model search using cosine similarity; when top_n is given,
+# ranking prunes documents that provably cannot reach the top N
+def vector_space_search(reverse_index, document_map, query_terms, top_n=None):
     query_vector = {}
     total_docs = len(document_map)
     query_term_counts = {}
     # Count occurrences of each term in the query
     for term in query_terms:
         query_term_counts[term] = query_term_counts.get(term, 0) + 1
+    # The max query frequency is constant across terms, so compute it once
+    # instead of rescanning the counts inside the loop
+    max_freq_in_query = max(query_term_counts.values(), default=1)
     # Calculate TF-IDF weights for each unique query term
     for term, count in query_term_counts.items():
-        if term in reverse_index:
-            df = reverse_index[term]['df']
-            max_freq_in_query = max(query_term_counts.values())
+        entry = reverse_index.get(term)
+        if entry is not None:
             tf = count / max_freq_in_query
-            idf = math.log2(total_docs / (df + 1)) + 1
+            idf = math.log2(total_docs / (entry['df'] + 1)) + 1
             query_vector[term] = tf * idf
     if not query_vector:
         return [], "No query terms found in index"
     similarities = []
     query_vector_length = math.sqrt(sum(tfidf**2 for tfidf in query_vector.values()))
-    # Calculate cosine similarity between query and each document
-    for doc_id in document_map.keys():
-        query_doc_dot_product = 0
-        # Loop through query vector terms to compute dot product with document vector
+    # Accumulate dot products term-at-a-time over the posting columns: only
+    # documents that actually contain a query term are ever touched, instead
+    # of probing every document in the corpus for every term
+    dot_products = {}
+    if top_n is None:
         for term, query_tfidf in query_vector.items():
-            doc = get_doc_data(reverse_index, term, doc_id)
-            if doc:
-                query_doc_dot_product += query_tfidf * doc['tf_idf']
-        doc_vector_length = document_map[doc_id]['vector_length']
-        if doc_vector_length > 0 and query_vector_length > 0:
-            cosine_similarity = query_doc_dot_product / (doc_vector_length * query_vector_length)
+            entry = reverse_index[term]
+            doc_ids = entry['doc_ids']
+            tf_idfs = entry['tf_idfs']
+            for i, doc_id in enumerate(doc_ids):
+                dot_products[doc_id] = dot_products.get(doc_id, 0.0) + query_tfidf * tf_idfs[i]
+    else:
+        # MaxScore-style pruning: process terms in order of their largest
+        # possible contribution (query weight times the term's max stored
+        # score) and track suffix bounds over the remaining terms
+        term_bounds = sorted(
+            ((query_vector[term] * reverse_index[term]['max_tfidf'], term)
+             for term in query_vector),
+            reverse=True,
+        )
+        suffix_bounds = [0.0] * (len(term_bounds) + 1)
+        for i in range(len(term_bounds) - 1, -1, -1):
+            suffix_bounds[i] = suffix_bounds[i + 1] + term_bounds[i][0]
+        # Partial scores only grow, so the running N-th best partial score
+        # is a valid lower bound on the final cutoff; a document first seen
+        # at term i can score at most suffix_bounds[i], and is skipped
+        # outright when even that cannot beat the bound
+        cutoff = 0.0
+        have_n_candidates = False
+        for i, (_, term) in enumerate(term_bounds):
+            entry = reverse_index[term]
+            query_tfidf = query_vector[term]
+            doc_ids = entry['doc_ids']
+            tf_idfs = entry['tf_idfs']
+            admit_new = not have_n_candidates or suffix_bounds[i] > cutoff
+            for j, doc_id in enumerate(doc_ids):
+                if doc_id in dot_products:
+                    dot_products[doc_id] += query_tfidf * tf_idfs[j]
+                elif admit_new:
+                    dot_products[doc_id] = query_tfidf * tf_idfs[j]
+            if len(dot_products) >= top_n:
+                cutoff = heapq.nlargest(top_n, dot_products.values())[-1]
+                have_n_candidates = True
+    matched_terms = list(query_vector.keys())
+    # Stored doc vectors are unit length, so the dot product only needs the
+    # query norm to become a cosine similarity
+    if query_vector_length > 0:
+        for doc_id, query_doc_dot_product in dot_products.items():
+            cosine_similarity = query_doc_dot_product / query_vector_length
             if cosine_similarity > 0:
                 similarities.append({
                     'doc_id': doc_id,
                     'similarity': cosine_similarity,
-                    'matched_terms': list(query_vector.keys())
+                    'matched_terms': matched_terms
                 })
     similarities.sort(key=lambda x: x['similarity'], reverse=True)
+    if top_n is not None:
+        # Pruning leaves an arbitrary number of surviving candidates beyond
+        # the top N, so neither their count nor the true match count is
+        # meaningful to report; return exactly the top N and say so
+        similarities = similarities[:top_n]
+        return similarities, f"Top {len(similarities)} document(s) using vector space model"
     return similarities, f"Found {len(similarities)} document(s) using vector space model"
-# Enhanced search function that handles OR, AND, BUT, phrase queries, and vector space model
-def enhanced_search(reverse_index, query, document_map=None):
+# Group query tokens into operand strings around a reserved operator word
+def split_on_operator(tokens, operator):
+    groups = []
+    current = []
+    for token in tokens:
+        if token == operator:
+            groups.append(' '.join(current))
+            current = []
+        else:
+            current.append(token)
+    groups.append(' '.join(current))
+    return groups
+# Enhanced search function that handles OR, AND, BUT, phrase queries, and
+# vector space model; top_n only affects multi-word vector-space ranking
+def enhanced_search(reverse_index, query, document_map=None, top_n=None):
     query = query.strip().lower()
     if (query.startswith('"') and query.endswith('"')) or (query.startswith("'") and query.endswith("'")):
         phrase_query = query[1:-1].strip()
@@ -129,65 +205,90 @@ def enhanced_search(reverse_index, query, document_map=None):
             return phrase_search(reverse_index, words, proximity=100)
         else:
             query = phrase_query
-    if " or " in query:
-        terms = [term.strip() for term in query.split(" or ")]
+    # One pass over the tokens decides the query type; a reserved word only
+    # counts as an operator with an operand on each side, matching the old
+    # substring checks where a leading or trailing 'or'/'and'/'but' was
+    # treated as a plain term
+    tokens = query.split()
+    has_or = has_but = has_and = False
+    last = len(tokens) - 1
+    for i, token in enumerate(tokens):
+        if 0 < i < last:
+            if token == 'or':
+                has_or = True
+            elif token == 'but':
+                has_but = True
+            elif token == 'and':
+                has_and = True
+    if has_or:
+        terms = split_on_operator(tokens, 'or')
         if len(terms) < 2:
             return None, "Invalid OR query format. Use: 'term1 or term2' or 'term1 or term2 or term3'"
         results = []
         found_docs = set()
-        # Collect documents matching any of the OR terms
+        # Collect documents matching any of the OR terms, probing the index
+        # once per term and walking its postings directly
         for term in terms:
-            for doc_id in get_doc_ids(reverse_index, term):
+            entry = reverse_index.get(term)
+            if entry is None:
+                continue
+            for doc_id, doc in entry['docs_by_id'].items():
                 if doc_id not in found_docs:
-                    doc = get_doc_data(reverse_index, term, doc_id)
                     results.append({
                         'doc_id': doc_id,
-                        'term_freq': doc['term_freq'],
-                        'tf_idf': doc['tf_idf'],
-                        'positions': doc['positions'],
+                        'term_freq': doc.term_freq,
+                        'tf_idf': doc.tf_idf,
+                        'positions': doc.positions,
                         'matched_term': term
                     })
                     found_docs.add(doc_id)
         terms_str = ' OR '.join([f"'{t}'" for t in terms])
         result_msg = f"Found {len(results)} document(s) containing {terms_str}"
         return results, result_msg
-    elif " but " in query:
-        terms = [term.strip() for term in query.split(" but ")]
+    elif has_but:
+        terms = split_on_operator(tokens, 'but')
         if len(terms) != 2:
             return None, "Invalid BUT query format. Use: 'term1 but term2'"
         term1, term2 = terms
-        if term1 not in reverse_index:
+        entry1 = reverse_index.get(term1)
+        if entry1 is None:
             return [], f"No documents found. First term '{term1}' not in index"
-        result_docs = get_doc_ids(reverse_index, term1) - get_doc_ids(reverse_index, term2)
+        docs_by_id1 = entry1['docs_by_id']
+        excluded = get_doc_ids(reverse_index, term2)
+        # Walk the first term's postings in stored order, skipping excluded
+        # docs, so the difference needs neither a set build nor a sort
+        result_docs = [doc_id for doc_id in docs_by_id1 if doc_id not in excluded]
         if not result_docs:
             return [], f"No documents found containing '{term1}' but not '{term2}'"
         results = []
         # Build result list from documents containing first term but not second
-        for doc_id in sorted(result_docs):
-            doc = get_doc_data(reverse_index, term1, doc_id)
+        for doc_id in result_docs:
+            doc = docs_by_id1[doc_id]
             results.append({
                 'doc_id': doc_id,
-                'term_freq': doc['term_freq'],
-                'tf_idf': doc['tf_idf'],
-                'positions': doc['positions'],
+                'term_freq': doc.term_freq,
+                'tf_idf': doc.tf_idf,
+                'positions': doc.positions,
                 'matched_term': f"{term1} (but not {term2})"
             })
         return results, f"Found {len(results)} document(s) containing '{term1}' but not '{term2}'"
-    elif " and " in query:
-        terms = [term.strip() for term in query.split(" and ")]
+    elif has_and:
+        terms = split_on_operator(tokens, 'and')
         if len(terms) < 2:
             return None, "Invalid AND query format. Use: 'term1 and term2' or 'term1 and term2 and term3'"
-        missing_terms = [term for term in terms if term not in reverse_index]
+        # Probe the index once per term for the missing check and the
+        # intersection; repeated terms collapse to a single probe
+        entries = {term: reverse_index.get(term) for term in terms}
+        missing_terms = [term for term, entry in entries.items() if entry is None]
         if missing_terms:
             return [], f"No documents found. Terms not in index: {', '.join(missing_terms)}"
-        doc_sets = [get_doc_ids(reverse_index, term) for term in terms]
-        common_docs = doc_sets[0].intersection(*doc_sets[1:]) if len(doc_sets) > 1 else doc_sets[0]
+        common_docs = common_doc_ids([entries[term]['docs_by_id'] for term in terms])
         if not common_docs:
             return [], f"No documents found containing all terms: {', '.join(terms)}"
         results = []
         # Build results from documents containing all AND terms
-        for doc_id in sorted(common_docs):
-            tf_idf, freq, positions, matched = aggregate_terms(reverse_index, terms, doc_id)
+        for doc_id in common_docs:
+            tf_idf, freq, positions, matched = aggregate_terms(entries, doc_id)
             results.append({
                 'doc_id': doc_id,
                 'term_freq': freq,
@@ -199,10 +300,10 @@ def enhanced_search(reverse_index, query, document_map=None):
         result_msg = f"Found {len(results)} document(s) containing {terms_str}"
         return results, result_msg
     else:
-        words = query.split()
+        words = tokens
         if len(words) > 1:
             if document_map is not None:
-                return vector_space_search(reverse_index, document_map, words)
+                return vector_space_search(reverse_index, document_map, words, top_n=top_n)
             else:
                 return phrase_search(reverse_index, words, proximity=100)
         else:
@@ -210,12 +311,12 @@ def enhanced_search(reverse_index, query, document_map=None):
                 entry = reverse_index[query]
                 results = []
                 # Collect all documents containing the single query term
-                for doc in entry['docs']:
+                for doc in entry['docs_by_id'].values():
                     results.append({
-                        'doc_id': doc['doc_id'],
-                        'term_freq': doc['term_freq'],
-                        'tf_idf': doc['tf_idf'],
-                        'positions': doc['positions'],
+                        'doc_id': doc.doc_id,
+                        'term_freq': doc.term_freq,
+                        'tf_idf': doc.tf_idf,
+                        'positions': doc.positions,
                         'matched_term': query
                     })
                 return results, f"Found {len(results)} document(s) containing '{query}'"